@@ -1,4 +1,8 @@
+import asyncio
+import json
+import httpx
 import pytest
+from collections import Counter
 from config import Config
 from secret_manager import SecretManager
 from models.youtube import YouTubeReader
@@ -32,6 +36,19 @@ async def test_count_tokens_video(youtube_reader):
     print(f"Token count: {count}")
 
 
+@pytest.mark.asyncio
+async def test_token_count_cache(youtube_reader):
+    """Test that known and cached token counts skip the countTokens call"""
+    yt_url = "https://www.youtube.com/watch?v=6stlCkUDG_s"
+
+    count = await youtube_reader._get_token_count(yt_url, known_token_count=1234)
+    assert count == 1234
+
+    # Second lookup is served from the cache
+    count = await youtube_reader._get_token_count(yt_url)
+    assert count == 1234
+
+
 @pytest.mark.asyncio
 async def test_estimate_token_rate(youtube_reader):
     """Test token rate estimation from video sample"""
@@ -98,3 +115,219 @@ async def test_custom_prompt(youtube_reader):
 
     assert result is not None
     print(f"Custom prompt result: {result.candidates[0].content.parts[0].text}")
+
+
+class _StaticSecretManager:
+    """Secret manager stand-in so mocked-transport tests need no GCP access"""
+
+    def get_secret(self, secret_name: str) -> str:
+        return "test-api-key"
+
+
+def _gemini_payload(text: str) -> dict:
+    """Minimal generateContent response body"""
+    return {
+        "candidates": [
+            {
+                "content": {"parts": [{"text": text}], "role": "model"},
+                "finishReason": "STOP",
+                "index": 0,
+            }
+        ],
+        "usageMetadata": {
+            "promptTokenCount": 1,
+            "candidatesTokenCount": 1,
+            "totalTokenCount": 2,
+            "promptTokensDetails": [],
+            "thoughtsTokenCount": 0,
+        },
+        "modelVersion": "gemini-2.5-flash",
+        "responseId": "test",
+    }
+
+
+def _chunk_start(request: httpx.Request) -> str:
+    """Return the start_offset of the chunk a request was made for"""
+    body = json.loads(request.content)
+    return body["contents"][0]["parts"][0]["video_metadata"]["start_offset"]
+
+
+@pytest.fixture
+def offline_reader():
+    """Fixture to create a YouTubeReader that never touches Secret Manager"""
+    config = Config()
+    config.gemini_base_url = "https://gemini.test/"
+    return YouTubeReader(config, _StaticSecretManager(), "gemini-2.5-flash")
+
+
+@pytest.fixture
+def gemini_transport(monkeypatch, offline_reader):
+    """Route httpx.AsyncClient through a MockTransport and skip retry sleeps"""
+    real_client = httpx.AsyncClient
+    monkeypatch.setattr(offline_reader, "_retry_delay", lambda retry_after, attempt: 0)
+
+    def install(handler):
+        monkeypatch.setattr(
+            httpx,
+            "AsyncClient",
+            lambda **kwargs: real_client(
+                transport=httpx.MockTransport(handler), **kwargs
+            ),
+        )
+
+    return install
+
+
+def test_retry_delay_caps_retry_after(offline_reader):
+    """Test that Retry-After is honoured but capped at 30 seconds"""
+    assert offline_reader._retry_delay("5", 0) == 5.0
+    assert offline_reader._retry_delay("3600", 0) == 30.0
+    assert offline_reader._retry_delay("-1", 0) == 0.0
+
+
+def test_retry_delay_exponential_backoff(offline_reader):
+    """Test backoff with jitter when Retry-After is missing or unparseable"""
+    assert 4 <= offline_reader._retry_delay(None, 2) < 5
+    assert 4 <= offline_reader._retry_delay("soon", 2) < 5
+    assert 30 <= offline_reader._retry_delay(None, 10) < 31
+
+
+@pytest.mark.asyncio
+async def test_chunk_retry_then_success(offline_reader, gemini_transport):
+    """Test that 503s and dropped connections are retried until success"""
+    attempts = Counter()
+
+    def handler(request):
+        start = _chunk_start(request)
+        attempts[start] += 1
+        if start == "0s" and attempts[start] < 3:
+            return httpx.Response(503, headers={"Retry-After": "0"})
+        if start == "10s" and attempts[start] < 2:
+            raise httpx.ConnectError("connection dropped", request=request)
+        return httpx.Response(200, json=_gemini_payload(f"chunk {start}"))
+
+    gemini_transport(handler)
+
+    responses = await offline_reader._process_chunks_concurrent(
+        "https://youtu.be/test", "prompt", "https://gemini.test/", [(0, 10), (10, 20)]
+    )
+
+    assert [r.candidates[0].content.parts[0].text for r in responses] == [
+        "chunk 0s",
+        "chunk 10s",
+    ]
+    assert attempts == {"0s": 3, "10s": 2}
+
+
+@pytest.mark.asyncio
+async def test_chunk_permanent_failure_fails_fast(offline_reader, gemini_transport):
+    """Test that a permanent failure is reported without waiting on siblings"""
+    slow_chunk_finished = False
+
+    async def handler(request):
+        nonlocal slow_chunk_finished
+        if _chunk_start(request) == "10s":
+            return httpx.Response(400)
+        await asyncio.sleep(30)
+        slow_chunk_finished = True
+        return httpx.Response(200, json=_gemini_payload("slow"))
+
+    gemini_transport(handler)
+
+    with pytest.raises(RuntimeError, match="chunk 2 of 2"):
+        await asyncio.wait_for(
+            offline_reader._process_chunks_concurrent(
+                "https://youtu.be/test",
+                "prompt",
+                "https://gemini.test/",
+                [(0, 10), (10, 20)],
+            ),
+            timeout=5,
+        )
+
+    assert not slow_chunk_finished
+
+
+@pytest.mark.asyncio
+async def test_chunks_keep_order_when_completed_out_of_order(
+    offline_reader, gemini_transport
+):
+    """Test that responses follow chunk order, not completion order"""
+
+    async def handler(request):
+        start = _chunk_start(request)
+        # Earlier chunks finish last
+        await asyncio.sleep({"0s": 0.03, "10s": 0.02, "20s": 0.01}[start])
+        return httpx.Response(200, json=_gemini_payload(f"chunk {start}"))
+
+    gemini_transport(handler)
+
+    responses = await offline_reader._process_chunks_concurrent(
+        "https://youtu.be/test",
+        "prompt",
+        "https://gemini.test/",
+        [(0, 10), (10, 20), (20, 30)],
+    )
+
+    assert [r.candidates[0].content.parts[0].text for r in responses] == [
+        "chunk 0s",
+        "chunk 10s",
+        "chunk 20s",
+    ]
+
+
+@pytest.mark.asyncio
+async def test_invalid_chunk_response_names_chunk(offline_reader, gemini_transport):
+    """Test that an invalid chunk response is reported with its chunk number"""
+
+    def handler(request):
+        text = "" if _chunk_start(request) == "20s" else "ok"
+        return httpx.Response(200, json=_gemini_payload(text))
+
+    gemini_transport(handler)
+
+    with pytest.raises(RuntimeError, match="for chunk 3"):
+        await offline_reader._process_chunks_concurrent(
+            "https://youtu.be/test",
+            "prompt",
+            "https://gemini.test/",
+            [(0, 10), (10, 20), (20, 30)],
+        )
+
+
+@pytest.mark.asyncio
+async def test_cancelling_caller_cancels_chunk_tasks(offline_reader, gemini_transport):
+    """Test that cancelling the caller leaves no orphaned chunk requests"""
+    all_started = asyncio.Event()
+    started = 0
+    cancelled = 0
+
+    async def handler(request):
+        nonlocal started, cancelled
+        started += 1
+        if started == 2:
+            all_started.set()
+        try:
+            await asyncio.sleep(30)
+        except asyncio.CancelledError:
+            cancelled += 1
+            raise
+        return httpx.Response(200, json=_gemini_payload("late"))
+
+    gemini_transport(handler)
+
+    task = asyncio.create_task(
+        offline_reader._process_chunks_concurrent(
+            "https://youtu.be/test",
+            "prompt",
+            "https://gemini.test/",
+            [(0, 10), (10, 20)],
+        )
+    )
+    await all_started.wait()
+    task.cancel()
+
+    with pytest.raises(asyncio.CancelledError):
+        await task
+
+    assert cancelled == 2
@@ -2,10 +2,10 @@ from config import Config
 from secret_manager import SecretManager
 from models.youtube_models import GeminiYouTubeResponse
 from typing import List, Optional, Tuple, Union
+import random
 import re
-import requests
-import httpx
 import asyncio
+from collections import OrderedDict
 from copy import deepcopy
 from pathlib import Path
 
@@ -46,6 +46,12 @@ class YouTubeReader:
         self.max_tokens_per_chunk = int(
             self.gemini_token_limit * 0.9
         )  # 90% safety buffer
+        # Bounded LRU of video token counts keyed by URL
+        self._token_count_cache: OrderedDict[str, int] = OrderedDict()
+        self._token_count_cache_size = 128
+        # Retry policy for chunk requests (rate limits and transient 5xx)
+        self.max_chunk_attempts = 5
+        self.retryable_status_codes = frozenset({429, 500, 502, 503, 504})
 
     def _build_headers(self) -> dict:
         """Build HTTP headers for Gemini API requests."""
@@ -91,9 +97,9 @@ class YouTubeReader:
         if len(candidate.content.parts) == 0:
             return False
 
-        # Check if the first part has text
+        # ContentPart requires text, so only check that it is non-empty
         first_part = candidate.content.parts[0]
-        if not hasattr(first_part, "text") or not first_part.text:
+        if not first_part.text:
             return False
 
         return True
@@ -108,6 +114,8 @@ class YouTubeReader:
         Returns:
             Total token count for the video
         """
+        import requests
+
         data = {"contents": [
             {"parts": [{"file_data": {"file_uri": youtube_url}}]}]}
 
@@ -118,6 +126,33 @@ class YouTubeReader:
 
         return result["totalTokens"]
 
+    async def _get_token_count(
+        self, youtube_url: str, known_token_count: Optional[int] = None
+    ) -> int:
+        """
+        Resolve the token count for a video, skipping the API call when possible.
+
+        Args:
+            youtube_url: YouTube video URL
+            known_token_count: Token count supplied by the caller, if any
+
+        Returns:
+            Total token count for the video
+        """
+        if known_token_count is not None:
+            token_count = known_token_count
+        elif youtube_url in self._token_count_cache:
+            token_count = self._token_count_cache[youtube_url]
+        else:
+            token_count = await self.count_tokens_video(youtube_url)
+
+        self._token_count_cache[youtube_url] = token_count
+        self._token_count_cache.move_to_end(youtube_url)
+        if len(self._token_count_cache) > self._token_count_cache_size:
+            self._token_count_cache.popitem(last=False)
+
+        return token_count
+
     async def estimate_token_rate(
         self, youtube_url: str, sample_duration: int = 60
     ) -> float:
@@ -131,6 +166,8 @@ class YouTubeReader:
         Returns:
             Estimated tokens per second (float)
         """
+        import httpx
+
         # Sample first 60 seconds
         sample_data = {
             "contents": [
@@ -151,7 +188,7 @@ class YouTubeReader:
         url = f"{self.base_url}models/{self.model}:countTokens"
 
         try:
-            async with httpx.AsyncClient(timeout=30.0) as client:
+            async with httpx.AsyncClient(timeout=30.0, http2=True) as client:
                 response = await client.post(
                     url, headers=self.headers, json=sample_data
                 )
@@ -189,16 +226,13 @@ class YouTubeReader:
         # Calculate chunk duration based on token limit
         chunk_duration = int(max_tokens / tokens_per_second)
 
-        # Generate chunk boundaries
-        chunks = []
-        start = 0
+        # Generate chunk boundaries (ceiling division gives the chunk count)
+        num_chunks = -(-total_duration // chunk_duration)
 
-        while start < total_duration:
-            end = min(start + chunk_duration, total_duration)
-            chunks.append((start, end))
-            start = end
-
-        return chunks
+        return [
+            (i * chunk_duration, min((i + 1) * chunk_duration, total_duration))
+            for i in range(num_chunks)
+        ]
 
     def get_default_prompt(
         self,
@@ -249,6 +283,8 @@ class YouTubeReader:
         Returns:
             GeminiYouTubeResponse
         """
+        import requests
+
         data = {
             "contents": [
                 {"parts": [{"text": prompt}, {
@@ -259,8 +295,7 @@ class YouTubeReader:
         try:
             response = requests.post(url, headers=self.headers, json=data)
             response.raise_for_status()
-            response_data = response.json()
-            return GeminiYouTubeResponse(**response_data)
+            return GeminiYouTubeResponse.model_validate_json(response.content)
 
         except requests.exceptions.RequestException as e:
             raise RuntimeError(f"Failed to send msg to Gemini: {str(e)}")
@@ -268,6 +303,26 @@ class YouTubeReader:
             raise RuntimeError(
                 f"Unexpected error when sending video: {str(e)}")
 
+    def _retry_delay(self, retry_after: Optional[str], attempt: int) -> float:
+        """
+        Compute how long to wait before retrying a failed chunk request.
+
+        Args:
+            retry_after: Value of the Retry-After header, if present
+            attempt: Zero-based attempt number that just failed
+
+        Returns:
+            Delay in seconds
+        """
+        if retry_after:
+            try:
+                return min(max(float(retry_after), 0.0), 30.0)
+            except ValueError:
+                pass
+
+        # Exponential backoff with jitter, capped at 30 seconds
+        return min(2**attempt, 30) + random.random()
+
     async def _process_chunks_concurrent(
         self,
         youtube_url: str,
@@ -276,7 +331,7 @@ class YouTubeReader:
         chunk_boundaries: List[Tuple[int, int]],
     ) -> List[GeminiYouTubeResponse]:
         """
-        Process all chunks concurrently.
+        Process all chunks concurrently, validating each as it completes.
 
         Args:
             youtube_url: YouTube video URL
@@ -285,10 +340,15 @@ class YouTubeReader:
             chunk_boundaries: List of (start_seconds, end_seconds) tuples
 
         Returns:
-            List of GeminiYouTubeResponse objects, one per chunk
+            List of GeminiYouTubeResponse objects, one per chunk, in order
+
+        Raises:
+            RuntimeError: If any chunk fails or returns an invalid response;
+                chunks still in flight are cancelled
         """
+        import httpx
 
-        async def process_chunk(start: int, end: int):
+        async def process_chunk(client: httpx.AsyncClient, start: int, end: int):
             chunk_data = {
                 "contents": [
                     {
@@ -306,14 +366,64 @@ class YouTubeReader:
                 ]
             }
 
-            async with httpx.AsyncClient(timeout=300.0) as client:
-                response = await client.post(url, headers=self.headers, json=chunk_data)
-                response.raise_for_status()
-                return GeminiYouTubeResponse(**response.json())
+            for attempt in range(self.max_chunk_attempts):
+                last_attempt = attempt == self.max_chunk_attempts - 1
+                try:
+                    response = await client.post(
+                        url, headers=self.headers, json=chunk_data
+                    )
+                except httpx.TransportError:
+                    # Dropped connections and timeouts are retried like 5xx
+                    if last_attempt:
+                        raise
+                    delay = self._retry_delay(None, attempt)
+                else:
+                    if (
+                        response.status_code not in self.retryable_status_codes
+                        or last_attempt
+                    ):
+                        response.raise_for_status()
+                        # Validate the raw bytes directly, skipping the dict copy
+                        return GeminiYouTubeResponse.model_validate_json(
+                            response.content
+                        )
+                    delay = self._retry_delay(
+                        response.headers.get("Retry-After"), attempt
+                    )
+
+                await asyncio.sleep(delay)
+
+        total = len(chunk_boundaries)
+        responses: List[Optional[GeminiYouTubeResponse]] = [None] * total
 
-        # Process all chunks concurrently
-        tasks = [process_chunk(start, end) for start, end in chunk_boundaries]
-        return await asyncio.gather(*tasks)
+        async def run_chunk(
+            client: httpx.AsyncClient, index: int, start: int, end: int
+        ) -> None:
+            try:
+                response = await process_chunk(client, start, end)
+            except Exception as e:
+                raise RuntimeError(
+                    f"Failed to process chunk {index + 1} of {total}: {str(e)}"
+                ) from e
+
+            if not self.validate_response(response):
+                raise RuntimeError(
+                    f"Invalid response structure from Gemini API for chunk {index + 1}"
+                )
+            responses[index] = response
+
+        # Process all chunks concurrently over a single HTTP/2 connection,
+        # validating each one as it finishes. The first permanent failure
+        # cancels the chunks still in flight instead of waiting on them.
+        try:
+            async with httpx.AsyncClient(timeout=300.0, http2=True) as client:
+                async with asyncio.TaskGroup() as group:
+                    for i, (start, end) in enumerate(chunk_boundaries):
+                        group.create_task(run_chunk(client, i, start, end))
+        except ExceptionGroup as eg:
+            raise eg.exceptions[0]
+
+        return responses
 
     def _combine_chunk_responses(
         self, responses: List[GeminiYouTubeResponse]
@@ -331,12 +441,11 @@ class YouTubeReader:
         combined = deepcopy(responses[0])
 
         # Concatenate all text parts with chunk markers
+        total = len(responses)
         combined_text = "\n\n".join(
-            [
-                f"--- Chunk {i+1} ({len(responses)} total chunks) ---\n{
-                    r.candidates[0].content.parts[0].text}"
-                for i, r in enumerate(responses)
-            ]
+            f"--- Chunk {i+1} ({total} total chunks) ---\n"
+            f"{r.candidates[0].content.parts[0].text}"
+            for i, r in enumerate(responses)
         )
 
         combined.candidates[0].content.parts[0].text = combined_text
@@ -344,7 +453,10 @@ class YouTubeReader:
         return combined
 
     async def analyze_video(
-        self, youtube_url: str, prompt: Optional[str] = None
+        self,
+        youtube_url: str,
+        prompt: Optional[str] = None,
+        known_token_count: Optional[int] = None,
     ) -> GeminiYouTubeResponse:
         """
         Analyze YouTube video using Gemini's multimodal capabilities.
@@ -353,6 +465,8 @@ class YouTubeReader:
         Args:
             youtube_url: Valid YouTube video URL
             prompt: Optional custom analysis prompt
+            known_token_count: Optional token count for the video; skips the
+                countTokens request when provided
 
         Returns:
             GeminiYouTubeResponse object with comprehensive results
@@ -367,8 +481,8 @@ class YouTubeReader:
         prompt = prompt or self.get_default_prompt()
         url = f"{self.base_url}models/{self.model}:generateContent"
 
-        # Get total token count
-        token_count = await self.count_tokens_video(youtube_url)
+        # Get total token count (caller-supplied or cached when available)
+        token_count = await self._get_token_count(youtube_url, known_token_count)
 
         # If under limit, process normally
         if token_count < self.gemini_token_limit:
@@ -383,19 +497,11 @@ class YouTubeReader:
             chunk_boundaries = self.calculate_chunks(
                 token_count, tokens_per_second)
 
-            # Process all chunks concurrently
+            # Process and validate all chunks concurrently
             chunk_responses = await self._process_chunks_concurrent(
                 youtube_url, prompt, url, chunk_boundaries
             )
 
-            # Validate all responses
-            for i, response in enumerate(chunk_responses):
-                if not self.validate_response(response):
-                    raise RuntimeError(
-                        f"Invalid response structure from Gemini API for chunk {
-                            i+1}"
-                    )
-
             # Combine responses
             return self._combine_chunk_responses(chunk_responses)
 
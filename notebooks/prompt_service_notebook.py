@@ -100,18 +100,13 @@ def _(db_name):
 def _(PromptType):
     def parse_db_name(db_name: str, prompt_type: PromptType) -> str:
         ls = db_name.split("_")
-        filename = ""
         if prompt_type == PromptType.PLAN:
             project = ls[0]
             plan_status = ls[1]
             print(f"project: {project}")
             print(f"plan status: {plan_status}")
 
-            for word in ls[2:]:
-                if not word.endswith(".md"):
-                    filename = filename + word + "_"
-                else:
-                    filename = filename + word
+            filename = "_".join(ls[2:])
             print(f"file name: {filename}")
 
             return filename
@@ -119,11 +114,7 @@ def _(PromptType):
         if prompt_type == PromptType.CMD:
             cmd_dir = ls[0]
             print(f"cmd/dir: {cmd_dir}")
-            for word in ls[1:]:
-                if not word.endswith(".md"):
-                    filename = filename + word + "_"
-                else:
-                    filename = filename + word
+            filename = "_".join(ls[1:])
             print(f"file name: {filename}")
 
             return filename
@@ -44,29 +44,22 @@ async def test_read_video_with_output_file(test_video_url, temp_output_dir):
 
 
 @pytest.mark.asyncio
-async def test_read_video_without_output_file(test_video_url, tmp_path):
+async def test_read_video_without_output_file(test_video_url, tmp_path, monkeypatch):
     """Test read_video with auto-generated filename"""
-    # Change to temp directory
-    import os
+    # Change to temp directory; pytest restores the cwd on teardown
+    monkeypatch.chdir(tmp_path)
 
-    original_cwd = os.getcwd()
-    os.chdir(tmp_path)
+    # Call function without output file
+    result = await read_video(test_video_url)
 
-    try:
-        # Call function without output file
-        result = await read_video(test_video_url)
-
-        # Assertions
-        assert isinstance(result, str)
-        assert len(result) > 0
-
-        # Check that a timestamped file was created
-        md_files = list(tmp_path.glob("youtube_analysis_*.md"))
-        assert len(md_files) == 1
-        assert md_files[0].read_text(encoding="utf-8") == result
+    # Assertions
+    assert isinstance(result, str)
+    assert len(result) > 0
 
-    finally:
-        os.chdir(original_cwd)
+    # Check that a timestamped file was created
+    md_files = list(tmp_path.glob("youtube_analysis_*.md"))
+    assert len(md_files) == 1
+    assert md_files[0].read_text(encoding="utf-8") == result
 
 
 @pytest.mark.asyncio